@@ -1,6 +1,19 @@
 type DepthNode = [number, Node];
 type NodeVisitor = (node: Node, depth: number) => void;
 
+// A new or changed node in a snapshot of the search (see TreeSnapshots in python/base.py).
+// The snapshots are only sent when mcts_json is called with an on_snapshot callback, which the pages do not do yet.
+export type NodeDelta = {
+    id: number;
+    parent?: number | null; // Only present for new nodes, null for the root
+    action?: string; // Only present for new nodes
+    visits: number;
+    score: number;
+    expected_value: number;
+};
+export type TreeDelta = { nodes: NodeDelta[] };
+export type NodeIndex = Map<number, Node>; // The nodes from previous snapshots by id
+
 // Note: This class is designed for Trees that are wider than they are deep
 export class Node {
     label: string;
@@ -13,6 +26,30 @@ export class Node {
         this.children = children;
     }
 
+    // Apply a snapshot to this tree in place, where this node is the root of the search.
+    // The value of each new or changed node is chosen by valueOf, so the tree must be rebuilt if the metric changes.
+    applyDelta(delta: TreeDelta, index: NodeIndex, valueOf: (node: NodeDelta) => number) {
+        for (const node of delta.nodes) {
+            const existing = index.get(node.id);
+
+            if (existing) {
+                existing.value = valueOf(node);
+            } else if (node.parent === null || node.parent === undefined) {
+                this.value = valueOf(node);
+                index.set(node.id, this);
+            } else {
+                const parent = index.get(node.parent);
+                if (!parent) {
+                    throw new Error(`Unable to apply the snapshot, the parent (${node.parent}) of node ${node.id} is unknown`);
+                }
+
+                const child = new Node(node.action ?? "", valueOf(node));
+                parent.children.push(child);
+                index.set(node.id, child);
+            }
+        }
+    }
+
     get breadth(): number {
        return Math.max.apply(null, this.breadths);
     }
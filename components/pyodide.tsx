@@ -76,6 +76,24 @@ class PyodideState {
         });
     }
 
+    // Download a file into the python file system so it can be opened by python code
+    loadFile(url: string, path: string): Promise<void> {
+        if (this.pyodide === null) {
+            return Promise.reject("pyodide is not ready");
+        }
+
+        const pyodide = this.pyodide;
+        return fetch(url)
+            .then((response) => {
+                if (!response.ok) {
+                    throw new Error(`Unable to download ${url}: ${response.status} ${response.statusText}`);
+                }
+
+                return response.arrayBuffer();
+            })
+            .then((buffer) => pyodide.FS.writeFile(path, new Uint8Array(buffer)));
+    }
+
     evaluate(code: string): Promise<any> {
         if (!this.isReady()) {
             return Promise.reject("Python Runtime Not Ready: " + this.getStatus().reason);
@@ -31,6 +31,7 @@ type Problem = {
   description: string;
   code: string;
   hide: boolean;
+  book?: string; // A precomputed search tree to continue searching from, see python/cli.py --save-book
 };
 const PROBLEMS: Problem[] = [
   {
@@ -38,6 +39,7 @@ const PROBLEMS: Problem[] = [
     description: "Play a game of Tic Tac Toe against the computer.",
     code: PYTHON_TIC_TAC_TOE,
     hide: true,
+    book: "/books/tic_tac_toe.mctb",
   },
   {
     name: "Problem 1",
@@ -61,6 +63,8 @@ const PROBLEMS: Problem[] = [
 
 const MemoizedResults = memo(Results);
 
+const BOOK_PATH = "/tmp/book.mctb"; // Where the problem's book is stored in the python file system
+
 export default function Home() {
   const pyodide = usePyodide();
 
@@ -78,14 +82,35 @@ export default function Home() {
     rawProblemUpdate(value);
   };
 
+  const book = problem.value.book;
   const evaluate = useCallback((code: string) => {
     console.info("Evaluating code...");
+    const bookArgument = book ? `, book="${BOOK_PATH}"` : "";
+
     pyodide.evaluate(BASE_SOLUTION) // Run the template code first
       .then(() => pyodide.evaluate(code)) // Then run the user's code
-      .then(() => pyodide.evaluate(`mcts_json(max_iterations=${maxIterations.value}, max_runtime=${maxRuntime.value})`)) // Finally, run the mcts_json function
+      .then(() => book ? pyodide.loadFile(book, BOOK_PATH) : undefined) // Download the book if the problem has one
+      .then(() => pyodide.evaluate(`mcts_json(max_iterations=${maxIterations.value}, max_runtime=${maxRuntime.value}${bookArgument})`)) // Finally, run the mcts_json function
       .then(result => setResult([null, result])) // If successful, set the result
       .catch(err => setResult([err, null])); // If there's an error, set the error
-  }, [pyodide, setResult, maxIterations.value, maxRuntime.value]);
+  }, [pyodide, setResult, maxIterations.value, maxRuntime.value, book]);
+
+  // Load the results from a file written by the command-line runner (python/cli.py)
+  const importResults = useCallback(() => {
+    const input = document.createElement("input");
+    input.type = "file";
+    input.accept = ".json,application/json";
+    input.onchange = () => {
+      const file = input.files?.[0];
+      if (!file) return;
+
+      console.info(`Importing results from ${file.name}...`);
+      file.text()
+        .then(text => setResult([null, JSON.parse(text)])) // If successful, set the result
+        .catch(err => setResult([err, null])); // If there's an error, set the error
+    };
+    input.click();
+  }, [setResult]);
 
   useEffect(() =>{
     const keybinds = {
@@ -93,10 +118,11 @@ export default function Home() {
       "s": () => actions.save(code),
       "l": actions.load,
       "d": actions.reset,
+      "i": importResults,
     };
 
     registerKeyboardEvents(keybinds)
-  }, [actions, evaluate, code]);
+  }, [actions, evaluate, importResults, code]);
 
   return (
     <main className="flex flex-row h-screen">
@@ -106,6 +132,7 @@ export default function Home() {
           { label: "Save", keybind: ["Control", "S"], onClick: () => actions.save(code) },
           { label: "Load", keybind: ["Control", "L"], onClick: () => actions.load() },
           { label: "Reset", keybind: ["Control", "D"], onClick: () => actions.reset() },
+          { label: "Import", keybind: ["Control", "I"], onClick: () => importResults() },
         ]}
         problem={problem}
         maxRuntime={maxRuntime}
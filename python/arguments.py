@@ -0,0 +1,24 @@
+import json
+
+# Command-line arguments shared by the cli, batch and grade tools
+
+# The budget of each search, per is what the budget applies to (e.g. "position")
+def add_budget_arguments(parser, per, max_iterations=1000, max_runtime=1.0):
+  parser.add_argument("--max-iterations", type=int, default=max_iterations, help=f"The maximum number of iterations per {per} (default: {max_iterations})")
+  parser.add_argument("--max-runtime", type=float, default=max_runtime, help=f"The maximum runtime in seconds per {per} (default: {max_runtime})")
+
+def add_policy_arguments(parser):
+  parser.add_argument("--selection-policy", default=None, help="The selection policy to use instead of the solution's select function, e.g. ucb1_tuned")
+  parser.add_argument("--policy-parameter", action="append", default=[], metavar="NAME=VALUE", help="A parameter of the selection policy, may be repeated")
+
+def add_position_argument(parser):
+  parser.add_argument("--position", type=json.loads, default=[], help="A JSON list of action names to search from (default: the initial state)")
+
+def parse_policy_parameters(parameters):
+  policy_parameters = {}
+
+  for parameter in parameters:
+    name, _, value = parameter.partition("=")
+    policy_parameters[name] = float(value)
+
+  return policy_parameters
@@ -1,19 +1,40 @@
+import json
+import math
 import time
 import random
+import struct
 
 import jsonpickle
 
 class Node():
+  # Slots remove the per-node dictionary, which reduces the memory used by large trees and speeds up attribute access
+  __slots__ = ("parent", "action", "children", "score", "visits", "score_squared", "amaf_score", "amaf_visits")
+
+  initial_history = () # The actions taken before the root, only a Root stores its own
+
   def __init__(self, parent, action):
     self.parent = parent
     self.action = action
     self.children = []
     self.score = 0
     self.visits = 0
+    self.score_squared = 0 # The sum of the squared scores, used to estimate the variance of the score (UCB1-Tuned)
+    self.amaf_score = 0 # All-Moves-As-First statistics gathered from the simulations (RAVE)
+    self.amaf_visits = 0
   
   def expected_value(self):
     return self.score / self.visits if self.visits > 0 else 0 # Should the default value be 0 or None?
 
+  def score_variance(self):
+    if self.visits == 0:
+      return 0
+
+    mean = self.expected_value()
+    return max(self.score_squared / self.visits - mean * mean, 0) # Clamp to avoid negative values from floating point error
+
+  def amaf_expected_value(self):
+    return self.amaf_score / self.amaf_visits if self.amaf_visits > 0 else 0
+
   def is_leaf(self):
     return len(self.children) == 0
   
@@ -28,11 +49,12 @@ class Node():
 
     history.reverse()
 
-    return history
+    return list(node.initial_history) + history
   
   def backpropagate(self, score):
     self.visits += 1
     self.score += score
+    self.score_squared += score * score
 
     if self.parent is not None:
       self.parent.backpropagate(score)
@@ -42,6 +64,171 @@ class Node():
       child = Node(parent=self, action=action)
       self.children.append(child)
 
+# The root of a search, only the root needs the actions taken before it so the other nodes do not have a slot for them
+class Root(Node):
+  __slots__ = ("initial_history",)
+
+  def __init__(self, action_sequence=()):
+    super().__init__(parent=None, action=None)
+    self.initial_history = tuple(action_sequence)
+
+# Convert a list of action names (e.g. ["X(1, 1)", "O(0, 0)"]) into the legal actions they refer to
+
+def parse_actions(names):
+  action_sequence = []
+
+  for name in names:
+    matches = [action for action in legal_actions(action_sequence) if str(action) == name]
+    if len(matches) == 0:
+      raise Exception(f"The action {name} is not a legal action after {[str(action) for action in action_sequence]}")
+
+    action_sequence.append(matches[0])
+
+  return action_sequence
+
+# Update the All-Moves-As-First statistics of the tree above the node using the actions taken to reach the terminal state.
+# A child of a node is updated if its action was taken at any point after the node, not just immediately after it.
+def backpropagate_amaf(node, action_sequence, score):
+  keys = [action_key(action) for action in action_sequence]
+  depth = len(node.history())
+  played = set(keys[depth:]) # The actions taken after the node (i.e. in the simulation)
+
+  current = node
+  while current is not None:
+    for child in current.children:
+      if action_key(child.action) in played:
+        child.amaf_visits += 1
+        child.amaf_score += score
+
+    if current.parent is not None:
+      played.add(action_key(current.action))
+    current = current.parent
+
+# The key used to compare actions for the AMAF statistics, scenarios can redefine this if the action has a cheaper identity
+def action_key(action):
+  return str(action)
+
+# Whether the player choosing the next action from this node is maximising the score.
+# This assumes two players alternate turns and the first player is the one the score is for, scenarios can redefine this.
+def is_maximising(node):
+  return len(node.history()) % 2 == 0
+
+# The prior probability of selecting the node's action from its parent, used by PUCT. Defaults to a uniform distribution.
+def prior(node):
+  return 1 / len(node.parent.children)
+
+# A key that is the same for actions that are equivalent after the action sequence (e.g. the corners of an empty tic-tac-toe
+# board), used by the grader to compare visits between searches. Defaults to every action being different.
+def symmetry_key(action_sequence, action):
+  return str(action)
+
+class SelectionPolicy():
+  uses_amaf = False # Whether the search needs to gather AMAF statistics for this policy
+  statistics = () # The node statistics the policy uses beyond the score and visits, these are included in the JSON output
+
+  # This function should return the value of selecting the child, sign is 1 if the player is maximising the score otherwise -1
+  def evaluate(self, child, sign):
+    raise NotImplementedError()
+
+class UCB1(SelectionPolicy):
+  def __init__(self, exploration=0.8):
+    self.exploration = exploration
+
+  def evaluate(self, child, sign):
+    if child.visits == 0:
+      return float("inf") # Since problem space is small we should visit all nodes at least once
+
+    exploitation = sign * child.expected_value()
+    exploration = self.exploration * math.sqrt(2 * math.log(child.parent.visits) / child.visits)
+    return exploitation + exploration
+
+# UCB1 with the exploration term bounded by the observed variance of the child's score (Auer et al. 2002)
+class UCB1Tuned(SelectionPolicy):
+  statistics = ("score_squared",)
+
+  def __init__(self, exploration=1.0):
+    self.exploration = exploration
+
+  def evaluate(self, child, sign):
+    if child.visits == 0:
+      return float("inf")
+
+    log_parent_visits = math.log(child.parent.visits)
+    variance_bound = child.score_variance() + math.sqrt(2 * log_parent_visits / child.visits)
+
+    exploitation = sign * child.expected_value()
+    exploration = self.exploration * math.sqrt(log_parent_visits / child.visits * min(0.25, variance_bound))
+    return exploitation + exploration
+
+# Predictor + UCB as used by AlphaZero, the exploration term is weighted by the prior of the child's action
+class PUCT(SelectionPolicy):
+  def __init__(self, exploration=1.0):
+    self.exploration = exploration
+
+  def evaluate(self, child, sign):
+    parent = child.parent
+
+    # Unvisited children take the value of their parent rather than being visited unconditionally
+    value = child.expected_value() if child.visits > 0 else parent.expected_value()
+
+    exploitation = sign * value
+    exploration = self.exploration * prior(child) * math.sqrt(parent.visits) / (1 + child.visits)
+    return exploitation + exploration
+
+# UCB1 blended with the AMAF value of the child, the AMAF value dominates while the child has few visits (Gelly & Silver 2007)
+class RAVE(SelectionPolicy):
+  uses_amaf = True
+  statistics = ("amaf_score", "amaf_visits")
+
+  def __init__(self, exploration=0.8, equivalence=300):
+    self.exploration = exploration
+    self.equivalence = equivalence # The number of visits at which the AMAF and UCB1 values are weighted equally
+
+  def evaluate(self, child, sign):
+    if child.visits == 0:
+      return float("inf")
+
+    beta = math.sqrt(self.equivalence / (3 * child.visits + self.equivalence))
+    value = (1 - beta) * child.expected_value() + beta * child.amaf_expected_value()
+
+    exploitation = sign * value
+    exploration = self.exploration * math.sqrt(2 * math.log(child.parent.visits) / child.visits)
+    return exploitation + exploration
+
+SELECTION_POLICIES = {
+  "ucb1": UCB1,
+  "ucb1_tuned": UCB1Tuned,
+  "puct": PUCT,
+  "rave": RAVE,
+}
+
+def create_selection_policy(name, **parameters):
+  if name not in SELECTION_POLICIES:
+    raise Exception(f"Unknown selection policy '{name}', expected one of: {', '.join(SELECTION_POLICIES)}")
+
+  return SELECTION_POLICIES[name](**parameters)
+
+# This function should return the child node with the highest value according to the selection policy
+def policy_select(node, policy):
+  if len(node.children) == 0:
+    raise Exception("The current node is a leaf node, cannot select a child node.")
+
+  sign = 1 if is_maximising(node) else -1
+
+  best_child = []
+  best_score = float("-inf")
+
+  for child in node.children:
+    score = policy.evaluate(child, sign)
+
+    if score > best_score:
+      best_score = score
+      best_child = [child]
+    elif score == best_score:
+      best_child.append(child)
+
+  return random.choice(best_child)
+
 def simulate(node):
   # Simulate a random game from the current node
   current = node
@@ -65,8 +252,82 @@ def breadth_first_search(node, on_visit):
     for child in current.children:
       queue.append(child)
 
-def monte_carlo_tree_search(max_runtime, max_iterations):
-  root = Node(parent=None, action=None)
+# Tracks the nodes that changed during the search so each snapshot only contains the nodes that are new or changed since the last one.
+# The first snapshot contains the whole tree, new nodes include the id of their parent and their action so they can be added to the
+# previous snapshots in the order they are listed.
+class TreeSnapshots():
+  def __init__(self, on_snapshot, interval=1000):
+    self.on_snapshot = on_snapshot # Called with the JSON encoded snapshot
+    self.interval = interval # The number of iterations between snapshots
+    self.ids = {} # The id of each node that has been included in a snapshot
+    self.dirty = set() # The nodes updated since the last snapshot
+
+  # Mark the node and its ancestors as changed, the ancestors of a changed node are already marked so this stops at the first marked node
+  def touch(self, node):
+    while node is not None and node not in self.dirty:
+      self.dirty.add(node)
+      node = node.parent
+
+  def update(self, root, node, iteration):
+    self.touch(node)
+
+    if (iteration + 1) % self.interval == 0:
+      self.emit(root)
+
+  # Send a snapshot unless nothing has changed since the last one (e.g. when the search ends right after a snapshot)
+  def emit(self, root):
+    if root in self.ids and len(self.dirty) == 0:
+      return
+
+    self.on_snapshot(json.dumps(self.snapshot(root)))
+
+  def new_node(self, node, parent):
+    self.ids[node] = len(self.ids)
+
+    return {
+      "id": self.ids[node],
+      "parent": self.ids[parent] if parent is not None else None,
+      "action": str(node.action),
+      "visits": node.visits,
+      "score": node.score,
+      "expected_value": node.expected_value(),
+    }
+
+  def changed_node(self, node):
+    return { "id": self.ids[node], "visits": node.visits, "score": node.score, "expected_value": node.expected_value() }
+
+  def snapshot(self, root):
+    nodes = []
+
+    if root not in self.ids:
+      nodes.append(self.new_node(root, None))
+    elif root in self.dirty:
+      nodes.append(self.changed_node(root))
+
+    # Only changed nodes can have new or changed children, so the rest of the tree is not visited
+    stack = [root]
+    while len(stack) > 0:
+      node = stack.pop()
+
+      for child in node.children:
+        if child not in self.ids:
+          nodes.append(self.new_node(child, node))
+          stack.append(child)
+        elif child in self.dirty:
+          nodes.append(self.changed_node(child))
+          stack.append(child)
+
+    self.dirty.clear()
+
+    return { "nodes": nodes }
+
+# If no selection policy is given the scenario's select function is used.
+# A previously searched tree (e.g. loaded from a book) can be given as the root to continue searching it, otherwise the search starts from the action sequence.
+# If snapshots are given they are sent while searching and once the search has finished.
+def monte_carlo_tree_search(max_runtime, max_iterations, policy=None, action_sequence=(), root=None, snapshots=None):
+  if root is None:
+    root = Root(action_sequence)
+  choose = select if policy is None else lambda node: policy_select(node, policy)
 
   start_time = time.time()
   for iteration in range(max_iterations):
@@ -76,19 +337,28 @@ def monte_carlo_tree_search(max_runtime, max_iterations):
     # Select Node to Expand
     current = root
     while not current.is_leaf():
-      current = select(current)
+      current = choose(current)
     
     # Expand the Leaf Node & Select a Child Node if Present
     current.expand()
     if not current.is_leaf():
-      current = select(current)
+      current = choose(current)
     
     # Simulate (Rollout & Score)
     terminal_node = simulate(current)
-    simulation_score = score(terminal_node.history())
+    action_sequence = terminal_node.history()
+    simulation_score = score(action_sequence)
     
     # Backpropagate
-    current = current.backpropagate(simulation_score)
+    current.backpropagate(simulation_score)
+    if policy is not None and policy.uses_amaf:
+      backpropagate_amaf(current, action_sequence, simulation_score)
+
+    if snapshots is not None:
+      snapshots.update(root, current, iteration)
+
+  if snapshots is not None:
+    snapshots.emit(root)
 
   best_move = None
   for move in root.children:
@@ -99,19 +369,133 @@ def monte_carlo_tree_search(max_runtime, max_iterations):
 
   return root, best_action
 
+def serializable_node(node, statistics):
+  serializable = {
+    "action": str(node.action), # Convert the action to a string for JSON serialization
+    "children": [],
+    "score": node.score,
+    "visits": node.visits,
+  }
+
+  for statistic in statistics:
+    serializable[statistic] = getattr(node, statistic)
+
+  return serializable
+
+# Convert the tree into dictionaries for JSON serialization, the parent references are left out as they are circular.
+# The statistics are the names of any extra node statistics to include, e.g. the ones used by the selection policy.
+def serializable_tree(tree, statistics=()):
+  root = serializable_node(tree, statistics)
+  # Convert the actions taken before the root to strings for JSON serialization
+  if len(tree.initial_history) > 0:
+    root["initial_history"] = [str(action) for action in tree.initial_history]
+
+  # The queue is not popped from the front as trees can be large
+  queue = [(tree, root)]
+  for node, serializable in queue:
+    serializable["expected_value"] = node.expected_value()
+
+    for child in node.children:
+      serializable_child = serializable_node(child, statistics)
+      serializable["children"].append(serializable_child)
+      queue.append((child, serializable_child))
+
+  return root
+
+# A book stores a searched tree as a header, the names of the actions taken before the root (as JSON) and then a fixed size record per node.
+# The records are in breadth first order and the children of a node are contiguous and in the order expand creates them, so the records of a
+# node's children can be found from its own record and the actions do not need to be stored.
+BOOK_MAGIC = b"MCTB"
+BOOK_VERSION = 1
+BOOK_HEADER = struct.Struct("<4sHII") # Magic, version, number of nodes, length of the initial history
+BOOK_RECORD = struct.Struct("<IddIdIH") # Visits, score, squared score, AMAF visits, AMAF score, index of the first child, number of children
+
+# Nodes with fewer than min_visits visits are saved without their children to keep the book small
+def save_tree(tree, path, min_visits=0):
+  nodes = [tree]
+  records = []
+
+  while len(records) < len(nodes):
+    node = nodes[len(records)]
+    children = node.children if node.visits >= min_visits else []
+
+    records.append(BOOK_RECORD.pack(node.visits, node.score, node.score_squared, node.amaf_visits, node.amaf_score, len(nodes), len(children)))
+    nodes.extend(children)
+
+  initial_history = json.dumps([str(action) for action in tree.initial_history]).encode()
+
+  with open(path, "wb") as file:
+    file.write(BOOK_HEADER.pack(BOOK_MAGIC, BOOK_VERSION, len(records), len(initial_history)))
+    file.write(initial_history)
+    file.write(b"".join(records))
+
+# Load the part of a book below the position reached by the action sequence, if the position is not in the book an empty root is returned
+def load_tree(path, action_sequence=()):
+  with open(path, "rb") as file:
+    return tree_from_book(file.read(), action_sequence)
+
+def tree_from_book(data, action_sequence):
+  magic, version, node_count, initial_history_length = BOOK_HEADER.unpack_from(data, 0)
+  if magic != BOOK_MAGIC or version != BOOK_VERSION:
+    raise Exception(f"The file is not a version {BOOK_VERSION} book")
+
+  offset = BOOK_HEADER.size + initial_history_length
+  book_history = json.loads(data[BOOK_HEADER.size:offset].decode())
+  record = lambda index: BOOK_RECORD.unpack_from(data, offset + index * BOOK_RECORD.size)
+
+  root = Root(action_sequence)
+
+  names = [str(action) for action in action_sequence]
+  if names[:len(book_history)] != book_history:
+    return root # The book starts from a different position
+
+  # Find the record of the position by following the actions taken after the book's root
+  index = 0
+  for depth in range(len(book_history), len(action_sequence)):
+    *_, first_child, child_count = record(index)
+    actions = [str(action) for action in legal_actions(action_sequence[:depth])]
+    if child_count == 0:
+      return root # The position is not in the book
+
+    if len(actions) != child_count:
+      raise Exception("The book does not match the legal actions of the game")
+
+    index = first_child + actions.index(names[depth])
+
+  # The queue is not popped from the front as books can be large
+  queue = [(root, index)]
+  for node, index in queue:
+    node.visits, node.score, node.score_squared, node.amaf_visits, node.amaf_score, first_child, child_count = record(index)
+
+    if child_count > 0:
+      node.expand()
+      if len(node.children) != child_count:
+        raise Exception("The book does not match the legal actions of the game")
+
+      for i, child in enumerate(node.children):
+        queue.append((child, first_child + i))
+
+  return root
+
+# The selection policy is one of SELECTION_POLICIES (e.g. "ucb1_tuned"), any extra keyword arguments are passed to the policy
+# The position is a list of action names to search from, by default the search starts from the initial state
+# The book is the path of a tree saved by save_tree to continue searching from (a warm start), and save_book is the path to save the searched tree to
+# If on_snapshot is given it is called with the changes to the tree (see TreeSnapshots) every snapshot_interval iterations.
+# The visualiser does not use this yet as it runs mcts_json from a code string, a caller has to pass the function itself (e.g. through pyodide.globals).
+def mcts_json(max_iterations=1000, max_runtime=1.0, selection_policy=None, position=(), book=None, save_book=None, book_min_visits=0, on_snapshot=None, snapshot_interval=1000, **policy_parameters):
+  policy = create_selection_policy(selection_policy, **policy_parameters) if selection_policy is not None else None
+  snapshots = TreeSnapshots(on_snapshot, snapshot_interval) if on_snapshot is not None else None
+  action_sequence = parse_actions(position)
 
-def mcts_json(max_iterations=1000, max_runtime=1.0):
   start = time.time()
-  tree, solution = monte_carlo_tree_search(max_runtime, max_iterations)
+  root = load_tree(book, action_sequence) if book is not None else None
+  tree, solution = monte_carlo_tree_search(max_runtime, max_iterations, policy, action_sequence, root, snapshots)
   end = time.time()
 
-  # Remove parent references for JSON serialization as it causes a circular reference
-  breadth_first_search(tree, lambda node: delattr(node, "parent"))
-  # Convert the expected value to a JSON-serializable value
-  breadth_first_search(tree, lambda node: setattr(node, "expected_value", node.expected_value()))
-  # Convert the action to a string for JSON serialization
-  breadth_first_search(tree, lambda node: setattr(node, "action", str(node.action)))
+  if save_book is not None:
+    save_tree(tree, save_book, book_min_visits)
 
+  tree = serializable_tree(tree, policy.statistics if policy is not None else ())
 
   return jsonpickle.encode({
     "time": end - start,
@@ -0,0 +1,163 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import multiprocessing
+
+from arguments import add_budget_arguments, add_policy_arguments, parse_policy_parameters
+from loader import REFERENCE_PATH, load_solution, resolve_solution
+
+# The solution loaded by each worker process, set by initialise_worker
+mcts = None
+
+# Memoize a function of an action sequence, the cache is kept for the lifetime of the worker so it is shared by every search it runs.
+# Actions are compared by identity unless they define their own equality, this still finds most repeats as the cached legal
+# actions are reused by both the tree and the simulations.
+def cached(function, cache_size):
+  cache = {}
+
+  def wrapper(action_sequence):
+    key = tuple(action_sequence)
+    if key in cache:
+      return cache[key]
+
+    result = function(action_sequence)
+    if len(cache) < cache_size:
+      cache[key] = result
+
+    return result
+
+  return wrapper
+
+def initialise_worker(solution_path, cache_size):
+  global mcts
+  mcts = load_solution(solution_path)
+
+  # The game rules are deterministic so their results can be reused between iterations and positions
+  if cache_size > 0:
+    mcts.legal_actions = cached(mcts.legal_actions, cache_size)
+    mcts.score = cached(mcts.score, cache_size)
+
+# A position that cannot be searched (e.g. it contains an illegal action) gets an error result rather than stopping the batch
+def search(job):
+  position, options = job
+
+  try:
+    return json.dumps(search_position(position, options))
+  except Exception as error:
+    return json.dumps({ "position": position, "error": f"{type(error).__name__}: {error}" })
+
+def search_position(position, options):
+  # Seed each search from its position so the results do not depend on which worker ran it or in what order
+  random.seed(f"{options['seed']}:{' '.join(position)}")
+
+  policy = None
+  if options["selection_policy"] is not None:
+    policy = mcts.create_selection_policy(options["selection_policy"], **options["policy_parameters"])
+
+  start = time.time()
+  tree, solution = mcts.monte_carlo_tree_search(options["max_runtime"], options["max_iterations"], policy, mcts.parse_actions(position))
+  end = time.time()
+
+  result = {
+    "position": position,
+    "time": end - start,
+    "iterations": tree.visits,
+    "solution": str(solution),
+    "children": [
+      { "action": str(child.action), "visits": child.visits, "score": child.score, "expected_value": child.expected_value() }
+      for child in tree.children
+    ],
+  }
+
+  if options["tree"]:
+    result["tree"] = mcts.serializable_tree(tree, policy.statistics if policy is not None else ())
+
+  return result
+
+# Every reachable non-terminal position, positions reached by playing the same actions in a different order are only included once.
+# This assumes the position only depends on the set of actions taken, which is true for placement games such as tic-tac-toe.
+def reachable_positions(solution_path, max_depth):
+  game = load_solution(solution_path)
+
+  positions = []
+  seen = set()
+  stack = [[]]
+
+  while len(stack) > 0:
+    action_sequence = stack.pop()
+    key = frozenset(game.action_key(action) for action in action_sequence)
+    if key in seen:
+      continue
+    seen.add(key)
+
+    actions = game.legal_actions(action_sequence)
+    if len(actions) == 0:
+      continue # Terminal positions have nothing to search
+
+    positions.append([str(action) for action in action_sequence])
+
+    if len(action_sequence) < max_depth:
+      for action in actions:
+        stack.append(action_sequence + [action])
+
+  return positions
+
+# Each line of the input is a JSON list of action names, e.g. ["X(1, 1)", "O(0, 0)"]
+def read_positions(file):
+  positions = []
+
+  for line in file:
+    line = line.strip()
+    if len(line) > 0:
+      positions.append(json.loads(line))
+
+  return positions
+
+def parse_arguments(arguments):
+  parser = argparse.ArgumentParser(description="Run a search from each of a list of positions and write the results as newline-delimited JSON.")
+  parser.add_argument("positions", nargs="?", default="-", help="File with a JSON list of action names per line, '-' reads from stdin (default: -). There is one result per line, in the same order")
+  parser.add_argument("--all-positions", action="store_true", help="Search every reachable non-terminal position instead of reading positions")
+  parser.add_argument("--max-depth", type=int, default=sys.maxsize, help="The maximum number of actions in a position when using --all-positions")
+  parser.add_argument("--solution", default=REFERENCE_PATH, help="A path or the name of a scenario to search with (default: tic_tac_toe)")
+  add_budget_arguments(parser, per="position")
+  add_policy_arguments(parser)
+  parser.add_argument("--workers", type=int, default=os.cpu_count(), help="The number of worker processes (default: number of CPUs)")
+  parser.add_argument("--seed", default="0", help="The seed the per-position random seeds are derived from (default: 0)")
+  parser.add_argument("--cache-size", type=int, default=1_000_000, help="The maximum number of cached game rule results per worker, 0 disables caching")
+  parser.add_argument("--tree", action="store_true", help="Include the full search tree of each position in the output")
+
+  return parser.parse_args(arguments)
+
+def main(arguments=None):
+  arguments = parse_arguments(arguments)
+  arguments.solution = resolve_solution(arguments.solution)
+
+  if arguments.all_positions:
+    positions = reachable_positions(arguments.solution, arguments.max_depth)
+  elif arguments.positions == "-":
+    positions = read_positions(sys.stdin)
+  else:
+    with open(arguments.positions) as file:
+      positions = read_positions(file)
+
+  options = {
+    "max_iterations": arguments.max_iterations,
+    "max_runtime": arguments.max_runtime,
+    "selection_policy": arguments.selection_policy,
+    "policy_parameters": parse_policy_parameters(arguments.policy_parameter),
+    "seed": arguments.seed,
+    "tree": arguments.tree,
+  }
+  jobs = [(position, options) for position in positions]
+
+  with multiprocessing.Pool(arguments.workers, initializer=initialise_worker, initargs=(arguments.solution, arguments.cache_size)) as pool:
+    # Results are written in the order of the positions as soon as they are available
+    for line in pool.imap(search, jobs):
+      sys.stdout.write(line + "\n")
+      sys.stdout.flush()
+
+if __name__ == "__main__":
+  main()
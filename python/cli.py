@@ -0,0 +1,136 @@
+import sys
+import json
+import time
+import random
+import argparse
+import multiprocessing
+
+from arguments import add_budget_arguments, add_policy_arguments, add_position_argument, parse_policy_parameters
+from loader import REFERENCE_PATH, load_solution, resolve_solution
+
+FORMATS = ["json", "pretty", "summary"]
+
+def run(job):
+  solution_path, seed, options = job
+
+  if seed is not None:
+    random.seed(seed)
+
+  mcts = load_solution(solution_path)
+  return json.loads(mcts.mcts_json(**options))
+
+# Combine the trees of independent searches (root parallelisation) by summing the statistics of nodes with the same action
+def merge_trees(tree, other):
+  for key, value in other.items():
+    if key not in ["action", "children", "expected_value", "initial_history"] and isinstance(value, (int, float)):
+      tree[key] = tree.get(key, 0) + value
+
+  tree["expected_value"] = tree["score"] / tree["visits"] if tree["visits"] > 0 else 0
+
+  children = { child["action"]: child for child in tree["children"] }
+  for child in other["children"]:
+    if child["action"] in children:
+      merge_trees(children[child["action"]], child)
+    else:
+      tree["children"].append(child)
+
+  return tree
+
+def merge_results(results, runtime):
+  tree = results[0]["tree"]
+  for result in results[1:]:
+    merge_trees(tree, result["tree"])
+
+  best_move = None
+  for move in tree["children"]:
+    if best_move is None or move["expected_value"] > best_move["expected_value"]:
+      best_move = move
+
+  return {
+    "time": runtime,
+    "solution": best_move["action"] if best_move is not None else str(None),
+    "tree": tree,
+  }
+
+def summary(result):
+  lines = [
+    f"Solution: {result['solution']}",
+    f"Time: {result['time']:.3f}s",
+    f"Iterations: {result['tree']['visits']}",
+    "",
+    f"{'Action':<12}{'Visits':>10}{'Score':>14}{'Expected Value':>18}",
+  ]
+
+  for child in sorted(result["tree"]["children"], key=lambda child: child["visits"], reverse=True):
+    lines.append(f"{child['action']:<12}{child['visits']:>10}{child['score']:>14.3f}{child['expected_value']:>18.4f}")
+
+  return "\n".join(lines) + "\n"
+
+def format_result(result, format):
+  if format == "json":
+    return json.dumps(result)
+  elif format == "pretty":
+    return json.dumps(result, indent=2)
+  elif format == "summary":
+    return summary(result)
+
+  raise Exception(f"Unknown output format '{format}', expected one of: {', '.join(FORMATS)}")
+
+def parse_arguments(arguments):
+  parser = argparse.ArgumentParser(description="Run the MCTS for a solution and write the search tree, the JSON output can be imported into the visualiser.")
+  parser.add_argument("solution", nargs="?", default=REFERENCE_PATH, help="A path or the name of a scenario, e.g. ucb_initial_weight (default: tic_tac_toe)")
+  add_budget_arguments(parser, per="worker")
+  add_policy_arguments(parser)
+  add_position_argument(parser)
+  parser.add_argument("--book", default=None, help="A book (saved search tree) to continue searching from, requires a single worker")
+  parser.add_argument("--save-book", default=None, help="Save the searched tree as a book to this path, requires a single worker")
+  parser.add_argument("--book-min-visits", type=int, default=0, help="Only save the children of nodes with at least this many visits (default: 0)")
+  parser.add_argument("--workers", type=int, default=1, help="The number of independent searches to run in parallel and merge (default: 1)")
+  parser.add_argument("--seed", default=None, help="Seed the searches so the results can be reproduced")
+  parser.add_argument("--format", choices=FORMATS, default="json", help="The output format (default: json)")
+  parser.add_argument("-o", "--output", default="-", help="The file to write the output to, '-' writes to stdout (default: -)")
+
+  arguments = parser.parse_args(arguments)
+  if arguments.save_book is not None and arguments.workers != 1:
+    parser.error("--save-book requires a single worker as the merged tree is not saved")
+  if arguments.book is not None and arguments.workers != 1:
+    parser.error("--book requires a single worker as each worker would load the book and merging would count it once per worker")
+
+  return arguments
+
+def main(arguments=None):
+  arguments = parse_arguments(arguments)
+
+  solution_path = resolve_solution(arguments.solution)
+  options = {
+    "max_iterations": arguments.max_iterations,
+    "max_runtime": arguments.max_runtime,
+    "selection_policy": arguments.selection_policy,
+    "position": arguments.position,
+    "book": arguments.book,
+    "save_book": arguments.save_book,
+    "book_min_visits": arguments.book_min_visits,
+    **parse_policy_parameters(arguments.policy_parameter),
+  }
+  seeds = [f"{arguments.seed}:{worker}" if arguments.seed is not None else None for worker in range(arguments.workers)]
+  jobs = [(solution_path, seed, options) for seed in seeds]
+
+  start = time.time()
+  if arguments.workers == 1:
+    results = [run(jobs[0])]
+  else:
+    with multiprocessing.Pool(arguments.workers) as pool:
+      results = pool.map(run, jobs)
+  end = time.time()
+
+  result = results[0] if len(results) == 1 else merge_results(results, end - start)
+  output = format_result(result, arguments.format)
+
+  if arguments.output == "-":
+    sys.stdout.write(output + ("" if output.endswith("\n") else "\n"))
+  else:
+    with open(arguments.output, "w") as file:
+      file.write(output)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,260 @@
+import sys
+import json
+import math
+import time
+import functools
+import random
+import argparse
+
+from arguments import add_budget_arguments, add_position_argument
+from loader import REFERENCE_PATH, load_solution, resolve_solution
+
+FORMATS = ["summary", "json"]
+
+class SearchRun():
+  def __init__(self, best_action, visit_fractions, iterations, runtime):
+    self.best_action = best_action
+    self.visit_fractions = visit_fractions # The fraction of the visits to each of the root's children, see search
+    self.iterations = iterations
+    self.runtime = runtime
+
+# The symmetry class of each of the actions from the position, by action name. The reference's classes are used for both
+# solutions so their visits are grouped the same way.
+def symmetry_classes(mcts, position):
+  action_sequence = mcts.parse_actions(position)
+  return { str(action): mcts.symmetry_key(action_sequence, action) for action in mcts.legal_actions(action_sequence) }
+
+# Equivalent actions (e.g. the corners of an empty tic-tac-toe board) are favoured differently from run to run, so the visits
+# are keyed by the action's symmetry class and its rank by visits within the class rather than by the action itself.
+# This keeps which class got the visits and how they are spread within it.
+def search(mcts, seed, options, classes):
+  random.seed(seed)
+
+  start = time.perf_counter()
+  tree, best_action = mcts.monte_carlo_tree_search(options["max_runtime"], options["max_iterations"], action_sequence=mcts.parse_actions(options["position"]))
+  end = time.perf_counter()
+
+  visits = {}
+  for child in tree.children:
+    name = str(child.action)
+    symmetry_class = classes.get(name, name) # An action the reference does not have is in a class of its own
+    visits.setdefault(symmetry_class, []).append(child.visits)
+
+  visit_fractions = {}
+  for symmetry_class, class_visits in visits.items():
+    for rank, child_visits in enumerate(sorted(class_visits, reverse=True)):
+      visit_fractions[(symmetry_class, rank)] = child_visits / tree.visits if tree.visits > 0 else 0
+
+  return SearchRun(str(best_action), visit_fractions, tree.visits, end - start)
+
+def total_variation_distance(a, b):
+  return sum(abs(x - y) for x, y in zip(a, b)) / 2
+
+# The distances between runs are cached as the permutation test compares the same runs many times
+@functools.lru_cache(maxsize=None)
+def run_distance(run, other_run):
+  keys = sorted(run.visit_fractions.keys() | other_run.visit_fractions.keys())
+  return total_variation_distance([run.visit_fractions.get(key, 0) for key in keys], [other_run.visit_fractions.get(key, 0) for key in keys])
+
+def mean_run_distance(runs, other_runs):
+  return sum(run_distance(run, other_run) for run in runs for other_run in other_runs) / (len(runs) * len(other_runs))
+
+# The energy distance between the root visit distributions of two groups of runs, which is 0 if the groups are identical.
+# Comparing every pair of runs rather than the mean distributions also detects a solution that concentrates its visits on
+# different actions from run to run, which averages out to a similar mean distribution.
+def visit_distribution_distance(runs, other_runs):
+  distance = mean_run_distance(runs, other_runs) - (mean_run_distance(runs, runs) + mean_run_distance(other_runs, other_runs)) / 2
+  return max(distance, 0) # Clamp to avoid negative values from floating point error
+
+# The distance between how often each action is chosen as the best action by two groups of runs
+def best_action_distance(runs, other_runs):
+  actions = sorted(set(run.best_action for run in runs + other_runs))
+  frequencies = lambda runs: [sum(run.best_action == action for run in runs) / len(runs) for action in actions]
+  return total_variation_distance(frequencies(runs), frequencies(other_runs))
+
+# A permutation test of whether the runs of the solution and the reference come from the same distribution.
+# The visits within a run are not independent samples, so whole runs are compared and the p-value is the chance of a
+# distance at least as large when the runs are randomly relabelled.
+# Also returns whether the test is conclusive, it is not if even the largest distance of any relabelling would not be
+# significant (e.g. when many relabellings tie at the largest distance). No distance, or the same distance for every
+# relabelling, means the runs agree rather than that the test cannot tell them apart.
+def permutation_test(solution_runs, reference_runs, distance, permutations, alpha, seed):
+  observed = distance(solution_runs, reference_runs)
+
+  generator = random.Random(seed)
+  runs = solution_runs + reference_runs
+  permuted = []
+
+  for _ in range(permutations):
+    generator.shuffle(runs)
+    permuted.append(distance(runs[:len(solution_runs)], runs[len(solution_runs):]))
+
+  largest = max(permuted + [observed])
+  p_value = (sum(value >= observed for value in permuted) + 1) / (permutations + 1)
+  minimum_p_value = (sum(value >= largest for value in permuted) + 1) / (permutations + 1)
+
+  agrees = observed == 0 or all(value == observed for value in permuted)
+  return observed, p_value, agrees or minimum_p_value <= alpha
+
+# The smallest p-value of an exact permutation test with this many runs of each solution, the observed labelling and the
+# labelling with the groups swapped always have the same distance
+def smallest_p_value(runs):
+  return 2 / math.comb(2 * runs, runs)
+
+def most_common(values):
+  return max(set(values), key=lambda value: (values.count(value), value))
+
+def iterations_per_second(runs):
+  return sum(run.iterations for run in runs) / sum(run.runtime for run in runs)
+
+def grade(solution_path, reference_path, options):
+  solution = load_solution(solution_path)
+  reference = load_solution(reference_path)
+  classes = symmetry_classes(reference, options["position"])
+
+  solution_runs = []
+  reference_runs = []
+
+  # The runs alternate between the reference and the solution, and which of them goes first alternates between runs,
+  # so both are timed under the same conditions and neither always pays for running first
+  for run in range(options["runs"]):
+    seed = f"{options['seed']}:{run}"
+    reference_first = run % 2 == 0
+
+    if reference_first:
+      reference_runs.append(search(reference, seed, options, classes))
+
+    try:
+      solution_runs.append(search(solution, seed, options, classes))
+    except Exception as error:
+      return { "passed": False, "error": f"The solution raised an exception: {error!r}" }
+
+    if not reference_first:
+      reference_runs.append(search(reference, seed, options, classes))
+
+  visit_distance, visit_p_value, visit_conclusive = permutation_test(solution_runs, reference_runs, visit_distribution_distance, options["permutations"], options["alpha"], options["seed"])
+  best_distance, best_p_value, best_conclusive = permutation_test(solution_runs, reference_runs, best_action_distance, options["permutations"], options["alpha"], options["seed"])
+  agreement = sum(a.best_action == b.best_action for a, b in zip(solution_runs, reference_runs)) / options["runs"]
+
+  solution_speed = iterations_per_second(solution_runs)
+  reference_speed = iterations_per_second(reference_runs)
+  relative_speed = solution_speed / reference_speed
+
+  # A correct solution may still use the random numbers differently to the reference, so rather than requiring identical
+  # searches it fails if either test finds a significant difference, or if either test could not have found one
+  conclusive = visit_conclusive and best_conclusive
+  correct = conclusive and visit_p_value >= options["alpha"] and best_p_value >= options["alpha"]
+  fast_enough = relative_speed >= options["min_relative_speed"]
+
+  return {
+    "passed": correct and fast_enough,
+    "correct": correct,
+    "conclusive": conclusive,
+    "fast_enough": fast_enough,
+    "best_action": most_common([run.best_action for run in solution_runs]),
+    "reference_best_action": most_common([run.best_action for run in reference_runs]),
+    "best_action_agreement": agreement,
+    "best_action_distance": best_distance,
+    "best_action_p_value": best_p_value,
+    "visit_distribution_distance": visit_distance,
+    "visit_distribution_p_value": visit_p_value,
+    "iterations_per_second": solution_speed,
+    "reference_iterations_per_second": reference_speed,
+    "relative_speed": relative_speed,
+  }
+
+# Grading the reference against itself must pass, from several positions and with several budgets, otherwise the grader
+# would fail correct solutions
+SELF_CHECK_POSITIONS = [[], ["X(1, 1)"], ["X(0, 0)", "O(1, 1)"]]
+SELF_CHECK_MAX_ITERATIONS = [500, 2000]
+
+def self_check(reference_path, options):
+  results = []
+
+  for position in SELF_CHECK_POSITIONS:
+    for max_iterations in SELF_CHECK_MAX_ITERATIONS:
+      result = grade(reference_path, reference_path, { **options, "position": position, "max_iterations": max_iterations })
+      results.append({ "position": position, "max_iterations": max_iterations, **result })
+
+  return results
+
+# The speed of the reference against itself only measures noise, so the self check only requires the searches to agree
+def self_check_summary(results):
+  lines = []
+
+  for result in results:
+    passed = result.get("correct", False)
+    lines.append(f"{'PASS' if passed else 'FAIL'}: position {json.dumps(result['position'])}, {result['max_iterations']} iterations")
+
+  return "\n".join(lines) + "\n"
+
+def summary(result):
+  if "error" in result:
+    return f"FAIL: {result['error']}\n"
+
+  lines = [
+    f"{'PASS' if result['passed'] else 'FAIL'}",
+    "",
+    f"Correctness: {'PASS' if result['correct'] else 'FAIL'}",
+    *([] if result["conclusive"] else ["  Inconclusive: the tests cannot detect a difference with these runs, increase --runs"]),
+    f"  Most common best action: {result['best_action']} (reference: {result['reference_best_action']})",
+    f"  Best action agreement: {result['best_action_agreement']:.0%} of runs",
+    f"  Best action distance: {result['best_action_distance']:.4f} (p = {result['best_action_p_value']:.4f})",
+    f"  Visit distribution distance: {result['visit_distribution_distance']:.4f} (p = {result['visit_distribution_p_value']:.4f})",
+    f"Speed: {'PASS' if result['fast_enough'] else 'FAIL'}",
+    f"  Iterations per second: {result['iterations_per_second']:.0f} (reference: {result['reference_iterations_per_second']:.0f})",
+    f"  Relative speed: {result['relative_speed']:.2f}x",
+  ]
+
+  return "\n".join(lines) + "\n"
+
+def parse_arguments(arguments):
+  parser = argparse.ArgumentParser(description="Grade a solution for correctness and speed by comparing its searches with the reference solution's searches using the same seeds.")
+  parser.add_argument("solution", nargs="?", default=None, help="A path or the name of a scenario, e.g. ucb_initial_weight")
+  parser.add_argument("--reference", default=REFERENCE_PATH, help="The reference solution to compare with (default: tic_tac_toe)")
+  parser.add_argument("--runs", type=int, default=20, help="The number of searches of each solution (default: 20)")
+  add_budget_arguments(parser, per="search", max_iterations=2000, max_runtime=60.0)
+  add_position_argument(parser)
+  parser.add_argument("--seed", default="0", help="The seed the searches' seeds are derived from (default: 0)")
+  parser.add_argument("--alpha", type=float, default=0.01, help="The significance level of each of the tests (default: 0.01)")
+  parser.add_argument("--permutations", type=int, default=1000, help="The number of permutations in each of the tests (default: 1000)")
+  parser.add_argument("--min-relative-speed", type=float, default=0.8, help="The minimum iterations per second relative to the reference (default: 0.8)")
+  parser.add_argument("--format", choices=FORMATS, default="summary", help="The output format (default: summary)")
+  parser.add_argument("--self-check", action="store_true", help="Check the reference passes against itself from several positions and budgets instead of grading a solution")
+
+  arguments = parser.parse_args(arguments)
+  if arguments.solution is None and not arguments.self_check:
+    parser.error("the solution is required unless using --self-check")
+  if (arguments.permutations + 1) * arguments.alpha < 1:
+    parser.error(f"--permutations must be at least {math.ceil(1 / arguments.alpha) - 1} for the tests to reach --alpha {arguments.alpha}")
+  if arguments.runs < 1 or smallest_p_value(arguments.runs) > arguments.alpha:
+    parser.error(f"--runs {arguments.runs} is too few for the tests to reach --alpha {arguments.alpha}")
+
+  return arguments
+
+def main(arguments=None):
+  arguments = parse_arguments(arguments)
+
+  options = {
+    "runs": arguments.runs,
+    "max_iterations": arguments.max_iterations,
+    "max_runtime": arguments.max_runtime,
+    "position": arguments.position,
+    "seed": arguments.seed,
+    "alpha": arguments.alpha,
+    "permutations": arguments.permutations,
+    "min_relative_speed": arguments.min_relative_speed,
+  }
+
+  if arguments.self_check:
+    results = self_check(resolve_solution(arguments.reference), options)
+    sys.stdout.write(self_check_summary(results) if arguments.format == "summary" else json.dumps(results) + "\n")
+    return 0 if all(result.get("correct", False) for result in results) else 1
+
+  result = grade(resolve_solution(arguments.solution), resolve_solution(arguments.reference), options)
+
+  sys.stdout.write(summary(result) if arguments.format == "summary" else json.dumps(result) + "\n")
+  return 0 if result["passed"] else 1
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,50 @@
+import os
+import sys
+import importlib.util
+
+PYTHON_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+BASE_PATH = os.path.join(PYTHON_DIRECTORY, "base.py")
+REFERENCE_PATH = os.path.join(PYTHON_DIRECTORY, "tic_tac_toe.py")
+SCENARIOS_DIRECTORY = os.path.join(PYTHON_DIRECTORY, "scenarios")
+
+# The solution can be a path or the name of the reference (tic_tac_toe) or a scenario (e.g. ucb_initial_weight)
+def resolve_solution(solution):
+  if os.path.isfile(solution):
+    return solution
+
+  name = solution if solution.endswith(".py") else solution + ".py"
+  for path in [os.path.join(PYTHON_DIRECTORY, name), os.path.join(SCENARIOS_DIRECTORY, name)]:
+    if os.path.isfile(path):
+      return path
+
+  scenarios = sorted(file[:-3] for file in os.listdir(SCENARIOS_DIRECTORY) if file.endswith(".py"))
+  raise Exception(f"Unable to find the solution {solution}, expected a path or one of: {', '.join(['tic_tac_toe'] + scenarios)}")
+
+def public_names(module):
+  return { name: value for name, value in vars(module).items() if not name.startswith("__") }
+
+def load_module(name, path, namespace=None):
+  spec = importlib.util.spec_from_file_location(name, path)
+  if spec is None:
+    raise Exception(f"Unable to load {path} as a python module")
+
+  module = importlib.util.module_from_spec(spec)
+  if namespace is not None:
+    vars(module).update(namespace)
+
+  sys.modules[name] = module
+  spec.loader.exec_module(module)
+
+  return module
+
+# In the browser the solution is run after base.py in the same namespace, so the solution can use anything base.py defines
+# and base.py calls the select, legal_actions and score functions defined by the solution.
+# Here both are loaded as separate modules and the solution's definitions are linked into base to get the same behaviour.
+def load_solution(path):
+  base = load_module("base", BASE_PATH)
+  solution = load_module("solution", path, namespace=public_names(base))
+
+  for name, value in public_names(solution).items():
+    setattr(base, name, value)
+
+  return base
@@ -70,26 +70,58 @@ class Board():
 
     return diagonals
 
+# Actions are interned, so there is only one instance of each of the possible actions and the player and position are only calculated once.
+# As the instances are shared they cannot be modified after they are created.
 class Action():
-  def __init__(self, player, position):
+  __slots__ = ("id", "player", "position")
+  instances = {}
+
+  def __new__(cls, player, position):
     x, y = position
-    self.id = player * BOARD_LENGTH + x * BOARD_SIDE_LENGTH + y
+    action_id = player * BOARD_LENGTH + x * BOARD_SIDE_LENGTH + y
 
-  @property
-  def player(self):
-    return self.id // BOARD_LENGTH
-  
-  @property
-  def position(self):
-    move = self.id % BOARD_LENGTH
-    x = move // BOARD_SIDE_LENGTH
-    y = move % BOARD_SIDE_LENGTH
-    return x, y
-  
+    action = cls.instances.get(action_id)
+    if action is None:
+      action = super().__new__(cls)
+      object.__setattr__(action, "id", action_id)
+      object.__setattr__(action, "player", player)
+      object.__setattr__(action, "position", (x, y))
+      cls.instances[action_id] = action
+
+    return action
+
+  def __setattr__(self, name, value):
+    raise AttributeError(f"Cannot set {name} of {self}, actions are shared so they cannot be modified")
+
+  def __delattr__(self, name):
+    raise AttributeError(f"Cannot delete {name} of {self}, actions are shared so they cannot be modified")
 
   def __repr__(self) -> str:
     return f"{PLAYERS[self.player]}{self.position}"
 
+# The rotations and reflections of the board, as functions of a position
+BOARD_SYMMETRIES = [
+  lambda x, y: (x, y),
+  lambda x, y: (BOARD_SIDE_LENGTH - 1 - y, x),
+  lambda x, y: (BOARD_SIDE_LENGTH - 1 - x, BOARD_SIDE_LENGTH - 1 - y),
+  lambda x, y: (y, BOARD_SIDE_LENGTH - 1 - x),
+  lambda x, y: (BOARD_SIDE_LENGTH - 1 - x, y),
+  lambda x, y: (x, BOARD_SIDE_LENGTH - 1 - y),
+  lambda x, y: (y, x),
+  lambda x, y: (BOARD_SIDE_LENGTH - 1 - y, BOARD_SIDE_LENGTH - 1 - x),
+]
+
+# Actions are equivalent if a rotation or reflection that leaves the board unchanged maps one onto the other, the key is the
+# equivalent action with the smallest position
+def symmetry_key(action_sequence, action):
+  board = Board(action_sequence)
+  positions = []
+
+  for symmetry in BOARD_SYMMETRIES:
+    if all(board[symmetry(x, y)] == board[x, y] for x in range(BOARD_SIDE_LENGTH) for y in range(BOARD_SIDE_LENGTH)):
+      positions.append(symmetry(*action.position))
+
+  return f"{PLAYERS[action.player]}{min(positions)}"
 
 ### BELOW IS THE CODE THAT YOU NEED TO DEBUG ###
 